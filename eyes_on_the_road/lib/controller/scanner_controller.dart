@@ -1,6 +1,7 @@
 import 'dart:io';
 
 import 'package:camera/camera.dart';
+import 'package:flutter/foundation.dart';
 import 'package:get/get.dart';
 import 'package:permission_handler/permission_handler.dart';
 import 'package:google_mlkit_object_detection/google_mlkit_object_detection.dart';
@@ -19,6 +20,7 @@ class ScannerController extends GetxController {
   ObjectDetector? objectDetector;
 
   var frameCount = 0;
+  bool _isDetecting = false;
   var isCameraReady = false.obs;
   var isInitializing = false.obs;
   var errorMessage = ''.obs;
@@ -75,13 +77,19 @@ class ScannerController extends GetxController {
 
         await cameraController.initialize();
 
-        // Start image stream after successful initialization
-        await cameraController.startImageStream((CameraImage image) async {
+        // Start image stream after successful initialization. Detection runs
+        // in the background so the frame callback returns immediately, and
+        // frames that arrive while a detection is in flight are dropped
+        // instead of queueing up behind it
+        await cameraController.startImageStream((CameraImage image) {
           frameCount++;
-          if (frameCount % 60 == 0) {
+          if (frameCount % 60 == 0 && !_isDetecting) {
             frameCount = 0;
-            await runDetector(cameras[0], cameraController, image);
-            update();
+            _isDetecting = true;
+            runDetector(cameras[0], cameraController, image).whenComplete(() {
+              _isDetecting = false;
+              update();
+            });
           }
         });
 
@@ -168,10 +176,12 @@ class ScannerController extends GetxController {
       s += "${positions[i]} ${labels[i]} ";
     }
     message = s;
-    print("Message: $message");
+    if (kDebugMode) {
+      print("Message: $message");
+    }
   }
 
-  runDetector(CameraDescription camera, CameraController controller,
+  Future<void> runDetector(CameraDescription camera, CameraController controller,
       CameraImage image) async {
     try {
       final inputImage = CameraImageConverter.inputImageFromCameraImage(
@@ -197,8 +207,6 @@ class ScannerController extends GetxController {
       List<double> areas = [];
 
       for (final detectedObject in detectedObjects) {
-        print("Bounding box: ${detectedObject.boundingBox}");
-
         final boundingBox = detectedObject.boundingBox;
         final imageWidth = inputImage.metadata!.size.width;
 
@@ -1,3 +1,5 @@
+import '../utils/polyline_utils.dart';
+
 class RouteModel {
   final String totalDistance;
   final String totalDuration;
@@ -19,6 +21,11 @@ class RouteModel {
     this.slopeMetrics = const {}, // Default to empty map
   });
 
+  // Overview polyline decoded once on first use and shared by every
+  // off-route check for the lifetime of the route
+  late final List<Map<String, double>> overviewPoints =
+      PolylineUtils.decodePolyline(overviewPolyline);
+
   factory RouteModel.fromJson(Map<String, dynamic> json) {
     List<RouteStep> stepsList = [];
     if (json.containsKey('steps') && json['steps'] is List) {
@@ -132,6 +139,13 @@ class RouteStep {
     this.polyline = '',
   });
 
+  // Step polyline decoded once on first use
+  late final List<Map<String, double>> polylinePoints =
+      PolylineUtils.decodePolyline(polyline);
+
+  // HTML tags and non-breaking spaces, matched in a single pass
+  static final RegExp _htmlMarkup = RegExp(r'<[^>]*>|&nbsp;');
+
   factory RouteStep.fromJson(Map<String, dynamic> json) {
     // Extract polyline if available
     String polylineStr = '';
@@ -143,9 +157,9 @@ class RouteStep {
 
     // Clean HTML from instructions if present
     String cleanInstructions = json['instructions'] ?? '';
-    cleanInstructions = cleanInstructions
-        .replaceAll(RegExp(r'<[^>]*>'), '') // Remove HTML tags
-        .replaceAll('&nbsp;', ' '); // Replace HTML space
+    // Remove HTML tags and replace HTML spaces
+    cleanInstructions = cleanInstructions.replaceAllMapped(
+        _htmlMarkup, (match) => match[0] == '&nbsp;' ? ' ' : '');
 
     return RouteStep(
       instructions: cleanInstructions,
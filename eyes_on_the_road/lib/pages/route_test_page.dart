@@ -66,8 +66,9 @@ class _RouteTestPageState extends State<RouteTestPage> {
       }
 
       // Process locations
-      final processedStart = await googleMapsService.preprocessCoordinates(startLocation);
-      final processedDestination = await googleMapsService.preprocessCoordinates(destination);
+      final endpoints = await googleMapsService.preprocessRouteEndpoints(startLocation, destination);
+      final processedStart = endpoints[0];
+      final processedDestination = endpoints[1];
 
       // Get navigation path
       final routeData = await googleMapsService.getNavigationPath(
@@ -4,27 +4,106 @@ import 'dart:io';
 import 'dart:math' as math;
 import 'package:flutter/foundation.dart';
 import 'package:http/http.dart' as http;
+import 'package:http/io_client.dart';
 import 'package:connectivity_plus/connectivity_plus.dart';
+import '../utils/polyline_utils.dart';
 
 class GoogleMapsService {
   final String apiKey;
-  final Map<String, dynamic> _responseCache = {};
+  // Decoded API responses keyed by request URL, kept in least-recently-used
+  // order so repeated lookups of common landmarks skip the network entirely
+  final _ResponseCache _responseCache = _ResponseCache(_maxCachedResponses);
+  static const int _maxCachedResponses = 1024;
+  // Directions responses are by far the largest, and every re-route has a new
+  // origin, so only the last few are kept in their own smaller cache
+  final _ResponseCache _directionsCache = _ResponseCache(_maxCachedDirections);
+  static const int _maxCachedDirections = 16;
+  static const Duration _directionsCacheTtl = Duration(hours: 24);
+
+  // Elevation API results keyed by "lat,lng" rounded to 1e-5 degrees, kept in
+  // least-recently-used order
+  final Map<String, dynamic> _elevationCache = {};
+  static const int _maxCachedElevations = 4096;
+
+  // Resolved place names for user-entered locations
+  final Map<String, String> _resolvedLocationCache = {};
+  static const int _maxResolvedLocations = 4096;
+
+  // One client for every Maps endpoint so connections to maps.googleapis.com
+  // are kept alive and reused instead of re-doing DNS + TLS on each call
+  final http.Client _client;
+  static const int _maxRetries = 3;
+  // Keep idle connections open well past dart:io's 15s default so follow-up
+  // requests during navigation (re-routing, alternatives) skip the handshake
+  static const Duration _connectionIdleTimeout = Duration(seconds: 90);
+  static const Duration _connectionTimeout = Duration(seconds: 5);
+  static const Set<int> _retryStatusCodes = {429, 500, 502, 503, 504};
+
+  // Fused decoder parses JSON straight from the response bytes without first
+  // building the whole body as a String
+  static final Converter<List<int>, Object?> _jsonUtf8Decoder = utf8.decoder.fuse(json.decoder);
+  static const int _backgroundDecodeThreshold = 64 * 1024;
 
   // Store the last route response to access alternative routes
   Map<String, dynamic>? _lastRoutesResponse;
+  // Scoring data for each route in the last response, keyed by route index,
+  // so switching alternatives reuses their flattened steps and slope metrics
+  Map<int, _RouteAnalysis> _lastRouteAnalyses = {};
   static const int _maxElevationSamples = 300;
+  // Dense enough that short steep sections still register in the max slope
+  // and total ascent, while a lone route stays well short of the full budget
+  static const int _maxElevationSamplesPerRoute = 100;
+  static const double _earthRadiusMeters = 6371000;
+  static const double _degToRad = math.pi / 180;
+  // Routes shorter than this are treated as flat without an elevation lookup
+  static const double _minSlopeRouteMeters = 200;
+
+  // Route scoring weights - adjust based on priorities
+  static const double _timeWeight = 1.0;     // Time is important
+  static const double _stepWeight = 0.3;     // Fewer steps is somewhat better
+  static const double _turnWeight = 0.5;     // Fewer turns is better
+  static const double _slopeWeight = 2.0;    // Slope is very important for walking
+  static const double _slopeScale = 1000;    // Scale up slope factor to seconds
+
+  // Case-insensitive match avoids lower-casing every step's instructions
+  static final RegExp _turnKeyword = RegExp('turn', caseSensitive: false);
+
+  // Tags stripped from step instructions, matched in a single pass
+  static final RegExp _htmlInstructionTags = RegExp(r'</?b>|<div[^>]*>|</div>');
+
+  GoogleMapsService({required this.apiKey, http.Client? client})
+      : _client = client ?? _createPooledClient();
+
+  static http.Client _createPooledClient() {
+    final httpClient = HttpClient()
+      ..idleTimeout = _connectionIdleTimeout
+      ..connectionTimeout = _connectionTimeout;
+    return IOClient(httpClient);
+  }
+
+  // Release the pooled connections
+  void close() {
+    _client.close();
+  }
 
-  GoogleMapsService({required this.apiKey});
+  static Map<String, dynamic> _decodeJsonBytes(List<int> bytes) {
+    return _jsonUtf8Decoder.convert(bytes) as Map<String, dynamic>;
+  }
 
   Future<bool> _checkConnectivity() async {
     var connectivityResult = await Connectivity().checkConnectivity();
     return connectivityResult != ConnectivityResult.none;
   }
 
-  Future<Map<String, dynamic>> _makeApiRequest(Uri uri, {bool useCache = true}) async {
+  Future<Map<String, dynamic>> _makeApiRequest(Uri uri,
+      {bool useCache = true, Duration? cacheTtl, _ResponseCache? cache}) async {
     final cacheKey = uri.toString();
-    if (useCache && _responseCache.containsKey(cacheKey)) {
-      return _responseCache[cacheKey];
+    final responseCache = cache ?? _responseCache;
+    if (useCache) {
+      final cached = responseCache.read(cacheKey);
+      if (cached != null) {
+        return cached;
+      }
     }
 
     try {
@@ -33,20 +112,34 @@ class GoogleMapsService {
         throw Exception('No internet connection. Please check your network settings and try again.');
       }
 
-      // Set timeout for the request
-      final response = await http.get(uri).timeout(
-        const Duration(seconds: 15),
-        onTimeout: () => throw TimeoutException('The connection has timed out. Please try again.'),
-      );
+      // Set timeout for the request, retrying transient failures with backoff
+      http.Response response;
+      int attempt = 0;
+      while (true) {
+        response = await _client.get(uri).timeout(
+          const Duration(seconds: 15),
+          onTimeout: () => throw TimeoutException('The connection has timed out. Please try again.'),
+        );
+
+        if (!_retryStatusCodes.contains(response.statusCode) || attempt >= _maxRetries) {
+          break;
+        }
+        attempt++;
+        await Future.delayed(Duration(milliseconds: 300 * (1 << (attempt - 1))));
+      }
 
       // Check response status
       if (response.statusCode == 200) {
-        // Decode JSON on the main thread since we're already handling the network request here
-        final result = json.decode(response.body) as Map<String, dynamic>;
+        // Parse the raw UTF-8 bytes directly; large payloads such as directions
+        // with alternatives are decoded on a background isolate
+        final bytes = response.bodyBytes;
+        final result = bytes.length > _backgroundDecodeThreshold
+            ? await compute(_decodeJsonBytes, bytes)
+            : _decodeJsonBytes(bytes);
 
         // Cache successful responses
-        if (useCache) {
-          _responseCache[cacheKey] = result;
+        if (useCache && result['status'] == 'OK') {
+          responseCache.write(cacheKey, result, cacheTtl);
         }
 
         return result;
@@ -72,30 +165,25 @@ class GoogleMapsService {
 
   // Check if the location string is in latitude,longitude format.
   bool isCoordinates(String location) {
-    final RegExp coordPattern =
-    RegExp(r'^(-?\d+\.?\d*),\s*(-?\d+\.?\d*)$');
-    final match = coordPattern.firstMatch(location.trim());
-
-    if (match != null) {
-      final lat = double.parse(match.group(1)!);
-      final lng = double.parse(match.group(2)!);
-      return (-90 <= lat && lat <= 90 && -180 <= lng && lng <= 180);
-    }
-    return false;
+    return extractCoordinates(location) != null;
   }
 
   // Get coordinates from a location string if it's in lat,lng format
   Map<String, double>? extractCoordinates(String location) {
-    final RegExp coordPattern =
-    RegExp(r'^(-?\d+\.?\d*),\s*(-?\d+\.?\d*)$');
-    final match = coordPattern.firstMatch(location.trim());
-
-    if (match != null) {
-      final lat = double.parse(match.group(1)!);
-      final lng = double.parse(match.group(2)!);
-      if (-90 <= lat && lat <= 90 && -180 <= lng && lng <= 180) {
-        return {'lat': lat, 'lng': lng};
-      }
+    // A plain split + parse is much cheaper than running a regex on every input
+    final parts = location.trim().split(',');
+    if (parts.length != 2) {
+      return null;
+    }
+
+    final lat = double.tryParse(parts[0]);
+    final lng = double.tryParse(parts[1].trim());
+    if (lat == null || lng == null) {
+      return null;
+    }
+
+    if (-90 <= lat && lat <= 90 && -180 <= lng && lng <= 180) {
+      return {'lat': lat, 'lng': lng};
     }
     return null;
   }
@@ -103,65 +191,83 @@ class GoogleMapsService {
   // Search for a place using the Google Places API or Geocoding API as fallback
   Future<String> getPlaceLocation(String placeName, {bool useGeocoding = true}) async {
     try {
-      if (!await _checkConnectivity()) {
-        throw Exception('No internet connection. Please check your network settings and try again.');
-      }
-
-      const placeUrl = 'https://maps.googleapis.com/maps/api/place/findplacefromtext/json';
-      final params = {
-        'input': '$placeName, Hong Kong',
-        'inputtype': 'textquery',
-        'fields': 'formatted_address,name,geometry',
-        'language': 'zh-TW',
-        'key': apiKey
-      };
-
-      try {
-        final uri = Uri.parse(placeUrl).replace(queryParameters: params);
-        final result = await _makeApiRequest(uri);
-
-        if (result['status'] == 'OK' &&
-            result.containsKey('candidates') &&
-            result['candidates'].isNotEmpty) {
-          final place = result['candidates'][0];
-          return place['formatted_address'];
-        } else if (useGeocoding) {
-          // Use Geocoding as fallback
-          const geocodeUrl = "https://maps.googleapis.com/maps/api/geocode/json";
-          final geocodeParams = {
-            'address': '$placeName, Hong Kong',
-            'key': apiKey,
-            'region': 'hk',
-            'language': 'zh-TW'
-          };
-
-          final geocodeUri = Uri.parse(geocodeUrl).replace(queryParameters: geocodeParams);
-          final geocodeResult = await _makeApiRequest(geocodeUri);
-
-          if (geocodeResult['status'] == 'OK' &&
-              geocodeResult.containsKey('results') &&
-              geocodeResult['results'].isNotEmpty) {
-            return geocodeResult['results'][0]['formatted_address'];
-          }
-        }
+      // Geocoding only runs when Places has no match, and both go through the
+      // shared client and response cache. Network and HTTP errors propagate
+      final address = await _findPlaceAddress(placeName) ??
+          (useGeocoding ? await _geocodeAddress(placeName) : null);
 
+      if (address == null) {
         throw Exception('Location not found: $placeName');
-      } catch (e) {
-        debugPrint('Error in getPlaceLocation: $e');
-        throw Exception('Error finding place: $e');
       }
+      return address;
     } catch (e) {
       debugPrint('Error in getPlaceLocation: $e');
-      rethrow; // Re-throw to be handled by the caller
+      throw Exception('Error finding place: $e');
+    }
+  }
+
+  // Look up a place with the Places API, returning null if it has no match;
+  // request failures are thrown to the caller
+  Future<String?> _findPlaceAddress(String placeName) async {
+    const placeUrl = 'https://maps.googleapis.com/maps/api/place/findplacefromtext/json';
+    final params = {
+      'input': '$placeName, Hong Kong',
+      'inputtype': 'textquery',
+      'fields': 'formatted_address', // Only the address is used
+      'language': 'zh-TW',
+      'key': apiKey
+    };
+
+    final uri = Uri.parse(placeUrl).replace(queryParameters: params);
+    final result = await _makeApiRequest(uri);
+
+    if (result['status'] == 'OK' &&
+        result.containsKey('candidates') &&
+        result['candidates'].isNotEmpty) {
+      return result['candidates'][0]['formatted_address'];
     }
+    return null;
+  }
+
+  // Look up a place with the Geocoding API, returning null if it has no match;
+  // request failures are thrown to the caller
+  Future<String?> _geocodeAddress(String placeName) async {
+    const geocodeUrl = "https://maps.googleapis.com/maps/api/geocode/json";
+    final geocodeParams = {
+      'address': '$placeName, Hong Kong',
+      'key': apiKey,
+      'region': 'hk',
+      'language': 'zh-TW'
+    };
+
+    final geocodeUri = Uri.parse(geocodeUrl).replace(queryParameters: geocodeParams);
+    final geocodeResult = await _makeApiRequest(geocodeUri);
+
+    if (geocodeResult['status'] == 'OK' &&
+        geocodeResult.containsKey('results') &&
+        geocodeResult['results'].isNotEmpty) {
+      return geocodeResult['results'][0]['formatted_address'];
+    }
+    return null;
   }
 
   // If location is lat,lng coordinates, convert to a proper place name
   Future<String> preprocessCoordinates(String location) async {
-    try {
-      if (isCoordinates(location)) {
-        final coords = extractCoordinates(location)!;
+    // Coordinates are keyed at 1e-5 degrees (about 1 m) so repeated queries
+    // from the same spot share one entry despite extra printed precision
+    final coords = extractCoordinates(location);
+    final cacheKey = coords != null
+        ? '${coords['lat']!.toStringAsFixed(5)},${coords['lng']!.toStringAsFixed(5)}'
+        : location.trim();
+    final cachedLocation = _resolvedLocationCache.remove(cacheKey);
+    if (cachedLocation != null) {
+      // Re-insert to mark the entry as most recently used
+      _resolvedLocationCache[cacheKey] = cachedLocation;
+      return cachedLocation;
+    }
 
+    try {
+      if (coords != null) {
         if (!await _checkConnectivity()) {
           return "Location (${coords['lat']!.toStringAsFixed(6)}, ${coords['lng']!.toStringAsFixed(6)})";
         }
@@ -169,7 +275,7 @@ class GoogleMapsService {
         // Use reverse geocoding for coordinates
         const geocodeUrl = "https://maps.googleapis.com/maps/api/geocode/json";
         final params = {
-          'latlng': '${coords['lat']},${coords['lng']}',
+          'latlng': cacheKey,
           'key': apiKey,
           'region': 'hk',
           'language': 'en-US'
@@ -181,19 +287,22 @@ class GoogleMapsService {
         if (result['status'] == 'OK' &&
             result.containsKey('results') &&
             result['results'].isNotEmpty) {
-          return result['results'][0]['formatted_address'];
+          final String address = result['results'][0]['formatted_address'];
+          _cacheResolvedLocation(cacheKey, address);
+          return address;
         } else {
           // If reverse geocoding fails, return a formatted string of the coordinates
           return "Location (${coords['lat']!.toStringAsFixed(6)}, ${coords['lng']!.toStringAsFixed(6)})";
         }
       } else {
-        return await getPlaceLocation(location);
+        final address = await getPlaceLocation(location);
+        _cacheResolvedLocation(cacheKey, address);
+        return address;
       }
     } catch (e) {
       debugPrint('Error in preprocessCoordinates: $e');
 
-      if (isCoordinates(location)) {
-        final coords = extractCoordinates(location)!;
+      if (coords != null) {
         return "Location (${coords['lat']!.toStringAsFixed(6)}, ${coords['lng']!.toStringAsFixed(6)})";
       }
 
@@ -201,93 +310,123 @@ class GoogleMapsService {
     }
   }
 
-  Future<List<Map<String, double>>> decodePolylineAsync(String polyline) async {
-    return compute(_decodePolyline, polyline);
+  // Resolve the origin and destination concurrently so their lookups overlap
+  // instead of running back to back; returns [origin, destination]
+  Future<List<String>> preprocessRouteEndpoints(String origin, String destination) {
+    return Future.wait([
+      preprocessCoordinates(origin),
+      preprocessCoordinates(destination),
+    ]);
   }
 
-  static List<Map<String, double>> _decodePolyline(String polyline) {
-    List<Map<String, double>> points = [];
-    int index = 0;
-    double lat = 0.0;
-    double lng = 0.0;
+  void _cacheResolvedLocation(String cacheKey, String address) {
+    _resolvedLocationCache[cacheKey] = address;
 
-    while (index < polyline.length) {
-      int shift = 0;
-      int result = 0;
+    // Evict the least recently used entry once the cache is full
+    if (_resolvedLocationCache.length > _maxResolvedLocations) {
+      _resolvedLocationCache.remove(_resolvedLocationCache.keys.first);
+    }
+  }
 
-      // Decode latitude
-      while (true) {
-        int b = polyline.codeUnitAt(index++) - 63;
-        result |= (b & 0x1f) << shift;
-        shift += 5;
-        if (b < 0x20) break;
-      }
+  Future<List<Map<String, double>>> decodePolylineAsync(String polyline) async {
+    return compute(PolylineUtils.decodePolyline, polyline);
+  }
 
-      double dlat = ((result & 1) != 0 ? ~(result >> 1) : (result >> 1)).toDouble();
-      lat += dlat;
+  // Evenly sample a route down to at most maxSamples points, keeping both ends
+  // and dropping consecutive duplicates that would only add zero-length segments
+  static List<Map<String, double>> _sampleRoutePoints(List<Map<String, double>> routePoints, int maxSamples) {
+    if (routePoints.isEmpty) {
+      return [];
+    }
 
-      // Decode longitude
-      shift = 0;
-      result = 0;
-      while (true) {
-        int b = polyline.codeUnitAt(index++) - 63;
-        result |= (b & 0x1f) << shift;
-        shift += 5;
-        if (b < 0x20) break;
-      }
+    // Calculate sampling interval; the last point is always added after the
+    // loop, so the loop itself may take at most maxSamples - 1 points
+    List<Map<String, double>> sampledPoints = [];
+    int interval = ((routePoints.length - 1) / math.max(1, maxSamples - 1)).ceil();
+    if (interval < 1) {
+      interval = 1;
+    }
 
-      double dlng = ((result & 1) != 0 ? ~(result >> 1) : (result >> 1)).toDouble();
-      lng += dlng;
+    void addSample(Map<String, double> point) {
+      if (sampledPoints.isNotEmpty &&
+          sampledPoints.last['lat'] == point['lat'] &&
+          sampledPoints.last['lng'] == point['lng']) {
+        return;
+      }
+      sampledPoints.add(point);
+    }
 
-      points.add({'lat': lat / 1e5, 'lng': lng / 1e5});
+    for (int i = 0; i < routePoints.length - 1; i += interval) {
+      addSample(routePoints[i]);
     }
 
-    return points;
+    addSample(routePoints.last);
+    return sampledPoints;
   }
 
   // Get elevation data for route points using the Google Elevation API
   Future<List<Map<String, dynamic>>> getElevationData(List<Map<String, double>> routePoints) async {
-    if (!await _checkConnectivity()) {
-      throw Exception('No internet connection. Please check your network settings and try again.');
-    }
+    final batches = await getElevationDataBatch([routePoints]);
+    return batches.first;
+  }
 
-    List<Map<String, double>> sampledPoints = [];
-    if (routePoints.length > _maxElevationSamples) {
-      // Calculate sampling interval
-      int interval = (routePoints.length / _maxElevationSamples).ceil();
-      sampledPoints.add(routePoints.first);
+  // Get elevation data for several routes with a single Elevation API request.
+  // The location budget is shared between routes and the flat result list is
+  // split back per route, so N alternatives cost one round trip instead of N.
+  Future<List<List<Map<String, dynamic>>>> getElevationDataBatch(List<List<Map<String, double>>> routesPoints) async {
+    final emptyResult = List.generate(routesPoints.length, (_) => <Map<String, dynamic>>[]);
+    final routeCount = routesPoints.where((points) => points.isNotEmpty).length;
+    if (routeCount == 0) {
+      return emptyResult;
+    }
 
-      for (int i = interval; i < routePoints.length - 1; i += interval) {
-        sampledPoints.add(routePoints[i]);
+    // Each route gets an even share of the location budget, up to the
+    // per-route cap
+    final samplesPerRoute = math.max(
+        2, math.min(_maxElevationSamplesPerRoute, _maxElevationSamples ~/ routeCount));
+    final sampledRoutes = routesPoints
+        .map((points) => _sampleRoutePoints(points, samplesPerRoute))
+        .toList();
+
+    // Key each sample by its 1e-5 degree location so points shared between
+    // alternatives, or seen on an earlier query, are only requested once
+    final sampledKeys = sampledRoutes
+        .map((points) => points.map(_elevationCacheKey).toList())
+        .toList();
+
+    // Cache hits are copied out (and marked as most recently used) before the
+    // fetch, so evicting to make room for new points cannot drop one of them
+    final Map<String, dynamic> resolved = {};
+    final Set<String> missingKeys = {};
+    for (final key in sampledKeys.expand((keys) => keys)) {
+      if (resolved.containsKey(key)) {
+        continue;
+      }
+      final cached = _elevationCache.remove(key);
+      if (cached != null) {
+        _elevationCache[key] = cached;
+        resolved[key] = cached;
+      } else {
+        missingKeys.add(key);
       }
-
-      sampledPoints.add(routePoints.last);
-    } else {
-      sampledPoints = List.from(routePoints);
     }
 
-    final locationString = sampledPoints.map((point) =>
-    "${point['lat']},${point['lng']}"
-    ).join('|');
-
-    // Setup API request
-    const url = "https://maps.googleapis.com/maps/api/elevation/json";
-    final params = {
-      'locations': locationString,
-      'key': apiKey
-    };
-
     try {
-      final uri = Uri.parse(url).replace(queryParameters: params);
-      final res = await _makeApiRequest(uri, useCache: true);
+      if (missingKeys.isNotEmpty) {
+        resolved.addAll(await _fetchElevations(missingKeys.toList()));
+      }
 
-      if (res['status'] == "OK") {
-        // Extract elevation results
-        final results = res['results'] as List;
+      // Assemble one elevation profile per route
+      List<List<Map<String, dynamic>>> batches = [];
+      for (final keys in sampledKeys) {
         List<Map<String, dynamic>> elevationData = [];
 
-        for (int i = 0; i < results.length; i++) {
-          final result = results[i];
+        for (int i = 0; i < keys.length; i++) {
+          final result = resolved[keys[i]];
+          if (result == null) {
+            throw Exception("Elevation API returned no result for ${keys[i]}");
+          }
+
           elevationData.add({
             'lat': result['location']['lat'],
             'lng': result['location']['lng'],
@@ -297,136 +436,226 @@ class GoogleMapsService {
           });
         }
 
-        return elevationData;
-      } else {
-        throw Exception("Elevation API error: ${res['status']}");
+        batches.add(elevationData);
       }
+
+      return batches;
     } catch (e) {
       debugPrint("Error getting elevation data: $e");
-      return []; // Return empty list on error - will fall back to default slope calculation
+      return emptyResult; // Return empty lists on error - will fall back to default slope calculation
+    }
+  }
+
+  static String _elevationCacheKey(Map<String, double> point) {
+    return "${point['lat']!.toStringAsFixed(5)},${point['lng']!.toStringAsFixed(5)}";
+  }
+
+  // Request elevations for the given location keys in one call, store them in
+  // the elevation cache and return them keyed by location
+  Future<Map<String, dynamic>> _fetchElevations(List<String> locationKeys) async {
+    if (!await _checkConnectivity()) {
+      throw Exception('No internet connection. Please check your network settings and try again.');
+    }
+
+    // Setup API request
+    const url = "https://maps.googleapis.com/maps/api/elevation/json";
+    final params = {
+      'locations': locationKeys.join('|'),
+      'key': apiKey
+    };
+
+    // Results are cached per location below, so skip the URL-keyed cache
+    final uri = Uri.parse(url).replace(queryParameters: params);
+    final res = await _makeApiRequest(uri, useCache: false);
+
+    if (res['status'] != "OK") {
+      throw Exception("Elevation API error: ${res['status']}");
+    }
+
+    // Results come back in request order
+    final results = res['results'] as List;
+    if (results.length != locationKeys.length) {
+      throw Exception("Elevation API returned ${results.length} results for ${locationKeys.length} locations");
     }
+
+    final Map<String, dynamic> fetched = {};
+    for (int i = 0; i < locationKeys.length; i++) {
+      fetched[locationKeys[i]] = results[i];
+      _elevationCache.remove(locationKeys[i]);
+      _elevationCache[locationKeys[i]] = results[i];
+    }
+
+    // Evict the least recently used points once the cache is full
+    while (_elevationCache.length > _maxCachedElevations) {
+      _elevationCache.remove(_elevationCache.keys.first);
+    }
+    return fetched;
+  }
+
+  static Map<String, dynamic> _defaultSlopeMetrics(double slopeFactor) {
+    return {
+      'avgSlope': 0.0,
+      'maxSlope': 0.0,
+      'totalAscent': 0.0,
+      'totalDescent': 0.0,
+      'slopeFactor': slopeFactor
+    };
   }
 
   Future<Map<String, dynamic>> computeRouteSlopeMetrics(String polyline) async {
+    final metrics = await computeRouteSlopeMetricsBatch([polyline]);
+    return metrics.first;
+  }
+
+  // Compute slope metrics for several routes, sharing one Elevation API request
+  Future<List<Map<String, dynamic>>> computeRouteSlopeMetricsBatch(List<String> polylines) async {
     try {
-      // Decode polyline to get path points
-      final points = _decodePolyline(polyline);
-
-      if (points.length < 2) {
-        return {
-          'avgSlope': 0.0,
-          'maxSlope': 0.0,
-          'totalAscent': 0.0,
-          'totalDescent': 0.0,
-          'slopeFactor': 0.0
-        };
-      }
+      // Decode polylines to get path points; routes that are too short to
+      // have a meaningful slope are left out of the elevation request
+      final routesPoints = polylines.map((polyline) {
+        final points = PolylineUtils.decodePolyline(polyline);
+        return points.length < 3 || _routeLengthMeters(points) < _minSlopeRouteMeters
+            ? <Map<String, double>>[]
+            : points;
+      }).toList();
+
+      // Get elevation data for path points of every route at once
+      final elevationBatches = await getElevationDataBatch(routesPoints);
+
+      return [
+        for (int i = 0; i < polylines.length; i++)
+          routesPoints[i].isEmpty
+              ? _defaultSlopeMetrics(0.0)
+              : _slopeMetricsFromElevations(elevationBatches[i]),
+      ];
+    } catch (e) {
+      debugPrint('Error computing route slope: $e');
+      // Default moderate slope factor on error
+      return List.generate(polylines.length, (_) => _defaultSlopeMetrics(0.5));
+    }
+  }
 
-      // Get elevation data for path points
-      final elevationData = await getElevationData(points);
-
-      // If no elevation data available, return default values
-      if (elevationData.isEmpty) {
-        return {
-          'avgSlope': 0.0,
-          'maxSlope': 0.0,
-          'totalAscent': 0.0,
-          'totalDescent': 0.0,
-          'slopeFactor': 0.5 // Default moderate slope factor
-        };
+  // Planar length of a decoded route (in meters)
+  static double _routeLengthMeters(List<Map<String, double>> points) {
+    const double metersPerDegreeLat = _earthRadiusMeters * _degToRad;
+    final double metersPerDegreeLng =
+        metersPerDegreeLat * math.cos(points.first['lat']! * _degToRad);
+
+    double length = 0.0;
+    for (int i = 1; i < points.length; i++) {
+      final double dy = (points[i]['lat']! - points[i - 1]['lat']!) * metersPerDegreeLat;
+      final double dx = (points[i]['lng']! - points[i - 1]['lng']!) * metersPerDegreeLng;
+      length += math.sqrt(dx * dx + dy * dy);
+      if (length >= _minSlopeRouteMeters) {
+        break; // Only need to know whether the threshold is reached
       }
+    }
+    return length;
+  }
 
-      double totalAscent = 0.0;
-      double totalDescent = 0.0;
-      double maxSlope = 0.0;
-      List<double> slopes = [];
-
-      // Process elevation changes along the route
-      for (int i = 0; i < elevationData.length - 1; i++) {
-        final point1 = elevationData[i];
-        final point2 = elevationData[i + 1];
-
-        // Calculate horizontal distance between points (in meters)
-        final double lat1 = point1['lat'];
-        final double lng1 = point1['lng'];
-        final double lat2 = point2['lat'];
-        final double lng2 = point2['lng'];
-
-        // Haversine formula for distance (simplified)
-        final double R = 6371000; // Earth radius in meters
-        final double dLat = (lat2 - lat1) * (math.pi / 180);
-        final double dLng = (lng2 - lng1) * (math.pi / 180);
-        final double a =
-            math.sin(dLat / 2) * math.sin(dLat / 2) +
-                math.sin(dLng / 2) * math.sin(dLng / 2) *
-                    math.cos(lat1 * math.pi / 180) * math.cos(lat2 * math.pi / 180);
-        final double c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a));
-        final double distance = R * c;
-
-        // Calculate elevation change
-        final double elev1 = point1['elevation'];
-        final double elev2 = point2['elevation'];
-        final double elevChange = elev2 - elev1;
-
-        // Track ascents and descents
-        if (elevChange > 0) {
-          totalAscent += elevChange;
-        } else {
-          totalDescent += elevChange.abs();
-        }
-
-        // Calculate slope (as percentage)
-        final double slope = distance > 0 ? (elevChange / distance) * 100 : 0;
-        slopes.add(slope);
+  // Derive slope metrics from the elevation profile of a single route
+  static Map<String, dynamic> _slopeMetricsFromElevations(List<Map<String, dynamic>> elevationData) {
+    // If no elevation data available, return default values
+    if (elevationData.isEmpty) {
+      return _defaultSlopeMetrics(0.5); // Default moderate slope factor
+    }
 
-        // Track maximum slope
-        if (slope.abs() > maxSlope) {
-          maxSlope = slope.abs();
-        }
+    double totalAscent = 0.0;
+    double totalDescent = 0.0;
+    double maxSlope = 0.0;
+    double slopeSum = 0.0;
+
+    // Latitude barely changes over a walking route (all of Hong Kong spans
+    // about 0.4 degrees), so the longitude scale is taken once from the
+    // route's mean latitude instead of per point
+    final int count = elevationData.length;
+    double latSum = 0.0;
+    for (final point in elevationData) {
+      latSum += (point['lat'] as num).toDouble();
+    }
+    const double metersPerDegreeLat = _earthRadiusMeters * _degToRad;
+    final double metersPerDegreeLng = metersPerDegreeLat * math.cos(latSum / count * _degToRad);
+
+    // Walk the profile once, carrying the previous point forward
+    final first = elevationData.first;
+    double prevLat = (first['lat'] as num).toDouble();
+    double prevLng = (first['lng'] as num).toDouble();
+    double prevElevation = (first['elevation'] as num).toDouble();
+
+    // Process elevation changes along the route
+    for (int i = 1; i < count; i++) {
+      final point = elevationData[i];
+      final double lat = (point['lat'] as num).toDouble();
+      final double lng = (point['lng'] as num).toDouble();
+      final double elevation = (point['elevation'] as num).toDouble();
+
+      // Horizontal distance between points (in meters). Over the short gaps
+      // between samples, the equirectangular projection at the route's mean
+      // latitude needs no trig, and its error is negligible next to the
+      // resolution of the elevation data
+      final double dy = (lat - prevLat) * metersPerDegreeLat;
+      final double dx = (lng - prevLng) * metersPerDegreeLng;
+      final double distance = math.sqrt(dx * dx + dy * dy);
+
+      // Calculate elevation change
+      final double elevChange = elevation - prevElevation;
+
+      // Track ascents and descents
+      if (elevChange > 0) {
+        totalAscent += elevChange;
+      } else {
+        totalDescent -= elevChange;
       }
 
-      // Calculate average slope
-      final double avgSlope = slopes.isNotEmpty ?
-      slopes.reduce((a, b) => a + b) / slopes.length : 0;
+      // Calculate slope (as percentage)
+      final double slope = distance > 0 ? (elevChange / distance) * 100 : 0;
+      slopeSum += slope;
 
-      // Calculate slope factor (0-1 scale, higher means more difficult terrain)
-      // This is a weighted combination of average slope, max slope, and total ascent
-      // Adjust weights as needed for your specific use case
-      final double slopeFactor = (
-          0.3 * (avgSlope.abs() / 10) + // Normalize to 0-1 range, assuming 10% as challenging avg slope
-              0.3 * (maxSlope / 20) +        // Normalize to 0-1 range, assuming 20% as challenging max slope
-              0.4 * (totalAscent / 100)       // Normalize to 0-1 range, assuming 100m as challenging ascent
-      ).clamp(0.0, 1.0);  // Ensure result is between 0-1
+      // Track maximum slope
+      if (slope.abs() > maxSlope) {
+        maxSlope = slope.abs();
+      }
 
-      return {
-        'avgSlope': avgSlope,
-        'maxSlope': maxSlope,
-        'totalAscent': totalAscent,
-        'totalDescent': totalDescent,
-        'slopeFactor': slopeFactor
-      };
-    } catch (e) {
-      debugPrint('Error computing route slope: $e');
-      return {
-        'avgSlope': 0.0,
-        'maxSlope': 0.0,
-        'totalAscent': 0.0,
-        'totalDescent': 0.0,
-        'slopeFactor': 0.5 // Default moderate slope factor on error
-      };
+      prevLat = lat;
+      prevLng = lng;
+      prevElevation = elevation;
     }
+
+    // Calculate average slope
+    final double avgSlope = count > 1 ? slopeSum / (count - 1) : 0;
+
+    // Calculate slope factor (0-1 scale, higher means more difficult terrain)
+    // This is a weighted combination of average slope, max slope, and total ascent
+    // Adjust weights as needed for your specific use case
+    final double slopeFactor = (
+        0.3 * (avgSlope.abs() / 10) + // Normalize to 0-1 range, assuming 10% as challenging avg slope
+            0.3 * (maxSlope / 20) +        // Normalize to 0-1 range, assuming 20% as challenging max slope
+            0.4 * (totalAscent / 100)       // Normalize to 0-1 range, assuming 100m as challenging ascent
+    ).clamp(0.0, 1.0);  // Ensure result is between 0-1
+
+    return {
+      'avgSlope': avgSlope,
+      'maxSlope': maxSlope,
+      'totalAscent': totalAscent,
+      'totalDescent': totalDescent,
+      'slopeFactor': slopeFactor
+    };
   }
 
-  // Recursively flattens nested steps in directions response
+  // Flattens nested steps in directions response, keeping their order
   static List<dynamic> flattenSteps(List<dynamic> steps) {
     List<dynamic> flattened = [];
 
-    for (var step in steps) {
+    // Depth-first walk with an explicit stack instead of recursion; steps are
+    // pushed in reverse so they are popped in their original order
+    final List<dynamic> stack = List.of(steps.reversed);
+    while (stack.isNotEmpty) {
+      final step = stack.removeLast();
       if (step.containsKey('steps') &&
           step['steps'] is List &&
           step['steps'].isNotEmpty) {
-        // If this step has sub-steps, flatten them recursively
-        flattened.addAll(flattenSteps(step['steps']));
+        // If this step has sub-steps, visit them in place of the step
+        stack.addAll((step['steps'] as List).reversed);
       } else {
         flattened.add(step);
       }
@@ -445,10 +674,8 @@ class GoogleMapsService {
         ? step['html_instructions'].toString()
         : '';
 
-    instructions = instructions.replaceAll(RegExp(r'<b>'), '')
-        .replaceAll(RegExp(r'</b>'), '')
-        .replaceAll(RegExp(r'<div[^>]*>'), ', ')
-        .replaceAll(RegExp(r'</div>'), '');
+    instructions = instructions.replaceAllMapped(
+        _htmlInstructionTags, (match) => match[0]!.startsWith('<div') ? ', ' : '');
 
     // Extract polyline if available
     String polylinePoints = '';
@@ -472,7 +699,9 @@ class GoogleMapsService {
       String origin,
       String destination,
       {String languageCode = 'en-US', int alternativeIndex = -1}) async {
-    print("Getting the path from $origin to $destination with language: $languageCode");
+    if (kDebugMode) {
+      debugPrint("Getting the path from $origin to $destination with language: $languageCode");
+    }
 
     // Check network connectivity
     if (!await _checkConnectivity()) {
@@ -488,7 +717,7 @@ class GoogleMapsService {
 
       if (alternativeIndex < routes.length) {
         // Process the selected alternative route
-        return _processSelectedRoute(routes[alternativeIndex], routes, alternativeIndex);
+        return _processAlternativeRoute(routes, alternativeIndex);
       } else {
         throw Exception("Alternative route index out of range");
       }
@@ -508,10 +737,13 @@ class GoogleMapsService {
 
     try {
       final uri = Uri.parse(url).replace(queryParameters: params);
-      final res = await _makeApiRequest(uri, useCache: false); // Don't cache routes
+      // Walking routes rarely change, so reuse them for repeated queries within a day
+      final res = await _makeApiRequest(uri, cacheTtl: _directionsCacheTtl, cache: _directionsCache);
 
-      // Store the response for potential alternative route requests
+      // Store the response for potential alternative route requests; analyses
+      // of the previous response no longer match its route indices
       _lastRoutesResponse = res;
+      _lastRouteAnalyses = {};
 
       if (res['status'] == "OK") {
         // Process the results directly in the main isolate
@@ -532,7 +764,7 @@ class GoogleMapsService {
     } on TimeoutException {
       throw Exception("Connection timed out. Please check your internet and try again.");
     } catch (e) {
-      print("Error in getNavigationPath: $e");
+      debugPrint("Error in getNavigationPath: $e");
       throw Exception("Failed to get navigation path: $e");
     }
   }
@@ -562,21 +794,29 @@ class GoogleMapsService {
     int nextRouteIndex = (currentRouteIndex + 1) % routes.length;
 
     // Process the selected alternative route
-    return _processSelectedRoute(routes[nextRouteIndex], routes, nextRouteIndex);
+    return _processAlternativeRoute(routes, nextRouteIndex);
+  }
+
+  // Process a route from the last response, reusing its scoring data if any
+  Future<Map<String, dynamic>> _processAlternativeRoute(List<dynamic> routes, int routeIndex) {
+    final analysis = _lastRouteAnalyses[routeIndex];
+    return _processSelectedRoute(routes[routeIndex], routes, routeIndex,
+        flattenedSteps: analysis?.flattenedSteps, slopeMetrics: analysis?.slopeMetrics);
   }
 
   // Process the selected route
-  Future<Map<String, dynamic>> _processSelectedRoute(dynamic selectedRoute, List<dynamic> allRoutes, int routeIndex) async {
+  Future<Map<String, dynamic>> _processSelectedRoute(dynamic selectedRoute, List<dynamic> allRoutes, int routeIndex,
+      {List<dynamic>? flattenedSteps, Map<String, dynamic>? slopeMetrics}) async {
     try {
       if (!selectedRoute.containsKey('legs') || selectedRoute['legs'].isEmpty) {
         throw Exception("Selected route has no legs");
       }
 
       final leg = selectedRoute['legs'][0]; // For walking, typically 1 leg
-      final steps = leg.containsKey('steps') ? List<dynamic>.from(leg['steps']) : <dynamic>[];
 
       // Flatten sub-steps to avoid duplicate instructions
-      final flattenedSteps = flattenSteps(steps);
+      flattenedSteps ??= flattenSteps(
+          leg.containsKey('steps') ? List<dynamic>.from(leg['steps']) : <dynamic>[]);
 
       // Process steps into a more usable format
       final processedSteps = <Map<String, dynamic>>[];
@@ -592,11 +832,10 @@ class GoogleMapsService {
         overviewPolyline = selectedRoute['overview_polyline']['points'] as String;
       }
 
-      // Calculate slope metrics for the route
-      Map<String, dynamic> slopeMetrics = {'slopeFactor': 0.5};
-      if (overviewPolyline.isNotEmpty) {
-        slopeMetrics = await computeRouteSlopeMetrics(overviewPolyline);
-      }
+      // Calculate slope metrics for the route unless the caller already has them
+      slopeMetrics ??= overviewPolyline.isNotEmpty
+          ? await computeRouteSlopeMetrics(overviewPolyline)
+          : {'slopeFactor': 0.5};
 
       // Add slope info to route data
       return {
@@ -617,6 +856,14 @@ class GoogleMapsService {
     }
   }
 
+  // Calculate weighted score for a route, lower is better
+  static double _scoreRoute(_RouteAnalysis analysis, double slopeFactor) {
+    return (_timeWeight * analysis.travelTime) +
+        (_stepWeight * analysis.stepCount) +
+        (_turnWeight * analysis.turnCount) +
+        (_slopeWeight * slopeFactor * _slopeScale);
+  }
+
   // Process route result and pick the best route
   Future<Map<String, dynamic>> _processRouteResult(Map<String, dynamic> res) async {
     try {
@@ -624,14 +871,16 @@ class GoogleMapsService {
           ? List<dynamic>.from(res['routes'])
           : <dynamic>[];
 
-      print("Number of routes returned by Directions API: ${routes.length}");
+      if (kDebugMode) {
+        debugPrint("Number of routes returned by Directions API: ${routes.length}");
+      }
 
       if (routes.isEmpty) {
         throw Exception("No routes found. Please try different locations.");
       }
 
-      // Analyze all routes for slope factors
-      List<Map<String, dynamic>> routeAnalyses = [];
+      // Extract everything scoring needs from each route in a single pass
+      List<_RouteAnalysis> routeAnalyses = [];
       for (int i = 0; i < routes.length; i++) {
         final route = routes[i];
 
@@ -647,12 +896,6 @@ class GoogleMapsService {
           polyline = route['overview_polyline']['points'] as String;
         }
 
-        // Calculate slope metrics
-        Map<String, dynamic> slopeMetrics = {'slopeFactor': 0.5}; // Default
-        if (polyline.isNotEmpty) {
-          slopeMetrics = await computeRouteSlopeMetrics(polyline);
-        }
-
         final leg = route['legs'][0]; // For walking, typically 1 leg
         final steps = leg.containsKey('steps') ? List<dynamic>.from(leg['steps']) : <dynamic>[];
 
@@ -664,68 +907,93 @@ class GoogleMapsService {
             ? leg['duration']['value'] as int
             : 999999;
 
-        // Number of (flattened) steps
-        final stepCount = flattenedSteps.length;
-
         // Count "turn" instructions as a proxy for complexity
         int turnCount = 0;
         for (var s in flattenedSteps) {
-          final htmlInstructions = s.containsKey('html_instructions')
-              ? s['html_instructions'].toString().toLowerCase()
-              : '';
-          if (htmlInstructions.contains('turn')) {
+          if (s.containsKey('html_instructions') &&
+              _turnKeyword.hasMatch(s['html_instructions'].toString())) {
             turnCount += 1;
           }
         }
 
-        routeAnalyses.add({
-          'index': i,
-          'travelTime': travelTime,
-          'stepCount': stepCount,
-          'turnCount': turnCount,
-          'slopeMetrics': slopeMetrics,
-        });
+        routeAnalyses.add(_RouteAnalysis(
+          index: i,
+          route: route,
+          polyline: polyline,
+          flattenedSteps: flattenedSteps,
+          travelTime: travelTime,
+          turnCount: turnCount,
+        ));
+      }
+
+      _lastRouteAnalyses = {for (var analysis in routeAnalyses) analysis.index: analysis};
+
+      // Per-route scoring details are collected and logged in a single call,
+      // and only in debug builds so release builds skip building the strings
+      final StringBuffer? scoringLog = kDebugMode ? StringBuffer() : null;
+
+      // Slope factor is within 0-1, so a route whose score with a flat slope is
+      // already worse than another route's score with the steepest slope can
+      // never win; drop it before paying for its elevation data
+      double bestWorstCaseScore = double.infinity;
+      for (var analysis in routeAnalyses) {
+        final worstCaseScore = _scoreRoute(analysis, analysis.polyline.isNotEmpty ? 1.0 : 0.5);
+        if (worstCaseScore < bestWorstCaseScore) {
+          bestWorstCaseScore = worstCaseScore;
+        }
+      }
+      routeAnalyses = routeAnalyses.where((analysis) {
+        if (_scoreRoute(analysis, 0.0) > bestWorstCaseScore) {
+          scoringLog?.writeln('Route ${analysis.index}: skipped, cannot beat score $bestWorstCaseScore');
+          return false;
+        }
+        return true;
+      }).toList();
+
+      // Calculate slope metrics for every remaining route with a polyline at once
+      final slopedAnalyses = routeAnalyses.where((analysis) => analysis.polyline.isNotEmpty).toList();
+      if (slopedAnalyses.isNotEmpty) {
+        final batchMetrics = await computeRouteSlopeMetricsBatch(
+            slopedAnalyses.map((analysis) => analysis.polyline).toList());
+        for (int j = 0; j < slopedAnalyses.length; j++) {
+          slopedAnalyses[j].slopeMetrics = batchMetrics[j];
+        }
       }
 
       // Evaluate and pick best route using all factors
-      Map<String, dynamic>? bestRoute;
+      _RouteAnalysis? best;
       double bestScore = double.infinity;
-      int bestRouteIndex = 0;
 
       for (var analysis in routeAnalyses) {
         // Scoring factors
-        final int travelTime = analysis['travelTime'];
-        final int stepCount = analysis['stepCount'];
-        final int turnCount = analysis['turnCount'];
-        final double slopeFactor = analysis['slopeMetrics']['slopeFactor'] ?? 0.5;
-
-        // Calculate weighted score - adjust weights based on priorities
-        const timeWeight = 1.0;     // Time is important
-        const stepWeight = 0.3;     // Fewer steps is somewhat better
-        const turnWeight = 0.5;     // Fewer turns is better
-        const slopeWeight = 2.0;    // Slope is very important for walking
+        final int travelTime = analysis.travelTime;
+        final int stepCount = analysis.stepCount;
+        final int turnCount = analysis.turnCount;
+        final double slopeFactor = analysis.slopeMetrics?['slopeFactor'] ?? 0.5;
 
-        final score = (timeWeight * travelTime) +
-            (stepWeight * stepCount) +
-            (turnWeight * turnCount) +
-            (slopeWeight * slopeFactor * 1000); // Scale up slope factor
+        final score = _scoreRoute(analysis, slopeFactor);
 
-        debugPrint('Route ${analysis['index']}: Time=$travelTime, Steps=$stepCount, Turns=$turnCount, Slope=$slopeFactor, Score=$score');
+        scoringLog?.writeln('Route ${analysis.index}: Time=$travelTime, Steps=$stepCount, Turns=$turnCount, Slope=$slopeFactor, Score=$score');
 
         // Update best route if this one is better
         if (score < bestScore) {
           bestScore = score;
-          bestRouteIndex = analysis['index'];
-          bestRoute = routes[bestRouteIndex];
+          best = analysis;
         }
       }
 
-      if (bestRoute == null) {
+      if (scoringLog != null) {
+        debugPrint(scoringLog.toString().trimRight());
+      }
+
+      if (best == null) {
         throw Exception("No valid routes found");
       }
 
-      // Process the best route
-      return await _processSelectedRoute(bestRoute, routes, bestRouteIndex);
+      // Process the best route, reusing its flattened steps and slope metrics
+      // rather than walking the route or requesting elevations again
+      return await _processSelectedRoute(best.route, routes, best.index,
+          flattenedSteps: best.flattenedSteps, slopeMetrics: best.slopeMetrics);
     } catch (e) {
       debugPrint('Error processing route: $e');
       rethrow;
@@ -734,14 +1002,75 @@ class GoogleMapsService {
 
   // Get the number of alternative routes available
   int getAlternativeRouteCount() {
-    if (_lastRoutesResponse == null) return 0;
+    final routes = _lastRoutesResponse?['routes'];
+    return routes is List ? routes.length : 0;
+  }
+}
 
-    final routes = _lastRoutesResponse!.containsKey('routes')
-        ? List<dynamic>.from(_lastRoutesResponse!['routes'])
-        : <dynamic>[];
+// Decoded API responses keyed by request URL, with optional expiry, holding
+// at most maxEntries in least-recently-used order
+class _ResponseCache {
+  final int maxEntries;
+  final Map<String, Map<String, dynamic>> _entries = {};
+  final Map<String, DateTime> _expiry = {};
+
+  _ResponseCache(this.maxEntries);
 
-    return routes.length;
+  Map<String, dynamic>? read(String key) {
+    final cached = _entries.remove(key);
+    if (cached == null) {
+      return null;
+    }
+
+    final expiry = _expiry[key];
+    if (expiry != null && DateTime.now().isAfter(expiry)) {
+      _expiry.remove(key);
+      return null;
+    }
+
+    // Re-insert to mark the entry as most recently used
+    _entries[key] = cached;
+    return cached;
   }
+
+  void write(String key, Map<String, dynamic> result, Duration? ttl) {
+    _entries.remove(key);
+    _entries[key] = result;
+    if (ttl != null) {
+      _expiry[key] = DateTime.now().add(ttl);
+    }
+
+    // Evict the least recently used entry once the cache is full
+    if (_entries.length > maxEntries) {
+      final oldestKey = _entries.keys.first;
+      _entries.remove(oldestKey);
+      _expiry.remove(oldestKey);
+    }
+  }
+}
+
+// Per-route values extracted once for scoring in _processRouteResult
+class _RouteAnalysis {
+  final int index;
+  final dynamic route;
+  final String polyline;
+  final List<dynamic> flattenedSteps;
+  final int travelTime;
+  final int turnCount;
+  // Null until fetched; routes pruned before the elevation request keep null
+  Map<String, dynamic>? slopeMetrics;
+
+  _RouteAnalysis({
+    required this.index,
+    required this.route,
+    required this.polyline,
+    required this.flattenedSteps,
+    required this.travelTime,
+    required this.turnCount,
+  });
+
+  // Number of (flattened) steps
+  int get stepCount => flattenedSteps.length;
 }
 
 class TimeoutException implements Exception {
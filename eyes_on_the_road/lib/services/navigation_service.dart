@@ -164,8 +164,9 @@ class NavigationService extends ChangeNotifier {
       }
 
       // Process locations directly on the main isolate
-      final processedStart = await _mapsService.preprocessCoordinates(startLocation);
-      final processedDestination = await _mapsService.preprocessCoordinates(destination);
+      final endpoints = await _mapsService.preprocessRouteEndpoints(startLocation, destination);
+      final processedStart = endpoints[0];
+      final processedDestination = endpoints[1];
 
       // Wait for location initialization to complete
       await locationFuture;
@@ -579,8 +580,8 @@ class NavigationService extends ChangeNotifier {
 
     // Check if we have the overview polyline to use for off-route detection
     if (_currentRoute!.overviewPolyline.isNotEmpty) {
-      // Decode the overview polyline
-      final routePoints = PolylineUtils.decodePolyline(_currentRoute!.overviewPolyline);
+      // Overview polyline points, decoded once per route
+      final routePoints = _currentRoute!.overviewPoints;
 
       // Calculate minimum distance to the route polyline
       final distanceToRoute = PolylineUtils.distanceToPolyline(userLat, userLng, routePoints);
@@ -607,14 +608,14 @@ class NavigationService extends ChangeNotifier {
     // Current step polyline
     final currentStep = _currentRoute!.steps[_currentStepIndex];
     if (currentStep.polyline.isNotEmpty) {
-      stepPolylinePoints.addAll(PolylineUtils.decodePolyline(currentStep.polyline));
+      stepPolylinePoints.addAll(currentStep.polylinePoints);
     }
 
     // Add previous step polyline (if not first step)
     if (_currentStepIndex > 0) {
       final prevStep = _currentRoute!.steps[_currentStepIndex - 1];
       if (prevStep.polyline.isNotEmpty) {
-        stepPolylinePoints.addAll(PolylineUtils.decodePolyline(prevStep.polyline));
+        stepPolylinePoints.addAll(prevStep.polylinePoints);
       }
     }
 
@@ -622,7 +623,7 @@ class NavigationService extends ChangeNotifier {
     if (_currentStepIndex < _currentRoute!.steps.length - 1) {
       final nextStep = _currentRoute!.steps[_currentStepIndex + 1];
       if (nextStep.polyline.isNotEmpty) {
-        stepPolylinePoints.addAll(PolylineUtils.decodePolyline(nextStep.polyline));
+        stepPolylinePoints.addAll(nextStep.polylinePoints);
       }
     }
 
@@ -772,8 +773,9 @@ class NavigationService extends ChangeNotifier {
       final String startLocation = _locationService.currentLocationString;
 
       // Process locations directly
-      final processedStart = await _mapsService.preprocessCoordinates(startLocation);
-      final processedDestination = await _mapsService.preprocessCoordinates(_destination);
+      final endpoints = await _mapsService.preprocessRouteEndpoints(startLocation, _destination);
+      final processedStart = endpoints[0];
+      final processedDestination = endpoints[1];
 
       // Get new navigation path directly
       final routeData = await _mapsService.getNavigationPath(
@@ -824,8 +826,9 @@ class NavigationService extends ChangeNotifier {
       final String startLocation = _locationService.currentLocationString;
 
       // Process locations
-      final processedStart = await _mapsService.preprocessCoordinates(startLocation);
-      final processedDestination = await _mapsService.preprocessCoordinates(_destination);
+      final endpoints = await _mapsService.preprocessRouteEndpoints(startLocation, _destination);
+      final processedStart = endpoints[0];
+      final processedDestination = endpoints[1];
 
       // Get an alternative route
       final routeData = await _mapsService.getAlternativeRoute(
@@ -8,23 +8,36 @@ class PolylineUtils {
     int index = 0, len = encoded.length;
     int lat = 0, lng = 0;
 
+    // Walking routes are dense, so nearly every delta fits in one or two
+    // chunks; those cases are unrolled and only longer deltas loop
     while (index < len) {
-      int b, shift = 0, result = 0;
-      do {
+      int b = encoded.codeUnitAt(index++) - 63;
+      int result = b & 0x1f;
+      if (b >= 0x20) {
         b = encoded.codeUnitAt(index++) - 63;
-        result |= (b & 0x1f) << shift;
-        shift += 5;
-      } while (b >= 0x20);
+        result |= (b & 0x1f) << 5;
+        int shift = 10;
+        while (b >= 0x20) {
+          b = encoded.codeUnitAt(index++) - 63;
+          result |= (b & 0x1f) << shift;
+          shift += 5;
+        }
+      }
       int dlat = ((result & 1) != 0 ? ~(result >> 1) : (result >> 1));
       lat += dlat;
 
-      shift = 0;
-      result = 0;
-      do {
+      b = encoded.codeUnitAt(index++) - 63;
+      result = b & 0x1f;
+      if (b >= 0x20) {
         b = encoded.codeUnitAt(index++) - 63;
-        result |= (b & 0x1f) << shift;
-        shift += 5;
-      } while (b >= 0x20);
+        result |= (b & 0x1f) << 5;
+        int shift = 10;
+        while (b >= 0x20) {
+          b = encoded.codeUnitAt(index++) - 63;
+          result |= (b & 0x1f) << shift;
+          shift += 5;
+        }
+      }
       int dlng = ((result & 1) != 0 ? ~(result >> 1) : (result >> 1));
       lng += dlng;
 
@@ -66,13 +79,20 @@ class PolylineUtils {
       return double.infinity;
     }
 
+    // The planar scale only depends on the query point, so project it and
+    // take its cosine once rather than for every segment
+    final double metersPerLng = _metersPerLat * math.cos(_toRadians(pointLat));
+    final double x = pointLng * metersPerLng;
+    final double y = pointLat * _metersPerLat;
+
     double minDistance = double.infinity;
 
     // Check distance to each segment of the polyline
     for (int i = 0; i < polyline.length - 1; i++) {
-      double distance = distanceToSegment(
-        pointLat,
-        pointLng,
+      double distance = _projectedDistanceToSegment(
+        x,
+        y,
+        metersPerLng,
         polyline[i]['lat']!,
         polyline[i]['lng']!,
         polyline[i + 1]['lat']!,
@@ -102,17 +122,35 @@ class PolylineUtils {
 
     // Convert to planar coordinates for simpler calculation
     // This is an approximation that works for small distances
-    const double metersPerLat = 111320.0; // Meters per degree latitude
-    double metersPerLng = 111320.0 * math.cos(_toRadians(pointLat)); // Meters per degree longitude varies with latitude
+    double metersPerLng = _metersPerLat * math.cos(_toRadians(pointLat)); // Meters per degree longitude varies with latitude
+
+    return _projectedDistanceToSegment(
+      pointLng * metersPerLng,
+      pointLat * _metersPerLat,
+      metersPerLng,
+      startLat,
+      startLng,
+      endLat,
+      endLng,
+    );
+  }
 
-    double x = pointLng * metersPerLng;
-    double y = pointLat * metersPerLat;
+  static const double _metersPerLat = 111320.0; // Meters per degree latitude
 
+  /// Distance from an already projected point (x, y) to a line segment
+  static double _projectedDistanceToSegment(
+      double x,
+      double y,
+      double metersPerLng,
+      double startLat,
+      double startLng,
+      double endLat,
+      double endLng) {
     double x1 = startLng * metersPerLng;
-    double y1 = startLat * metersPerLat;
+    double y1 = startLat * _metersPerLat;
 
     double x2 = endLng * metersPerLng;
-    double y2 = endLat * metersPerLat;
+    double y2 = endLat * _metersPerLat;
 
     // Calculate squared length of segment
     double lengthSquared = (x2 - x1) * (x2 - x1) + (y2 - y1) * (y2 - y1);
@@ -132,4 +170,4 @@ class PolylineUtils {
     // Return distance from point to nearest point on segment
     return math.sqrt((x - projectionX) * (x - projectionX) + (y - projectionY) * (y - projectionY));
   }
-}
\ No newline at end of file
+}